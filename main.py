@@ -1,15 +1,26 @@
+import logging
 import os
+import re
+import time
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
+import aiofiles
+import orjson
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
 
-from database import db, create_document, get_documents
-from schemas import UserProfile, ChatMessage, RewardLedger, PremiumPass, VaultDocument
+from database import db, create_document, create_documents, get_documents
+from schemas import UserProfile, RewardLedger, PremiumPass, VaultDocument
 
-app = FastAPI(title="AI Travel Assistant API")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="AI Travel Assistant API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +29,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress larger payloads such as chat history; small responses go out as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 # ---------- Utility ----------
@@ -27,20 +40,74 @@ COLLECTION_REWARD = "rewardledger"
 COLLECTION_PASS = "premiumpass"
 COLLECTION_VAULT = "vaultdocument"
 
+# Fields returned to clients by the list endpoints (_id is always included)
+HISTORY_FIELDS = {"role": 1, "content": 1, "meta": 1, "created_at": 1}
+PASS_FIELDS = {"feature": 1, "expires_at": 1, "created_at": 1}
+
 WELCOME_COINS = 10
+_UTC = timezone.utc
+UPLOAD_CHUNK_SIZE = 1 << 20
+VAULT_DIR = "/tmp/travel_vault"
+VOICE_DIR = "/tmp/travel_voice"
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response that stringifies ObjectId (and other unknown types) itself.
+
+    Return it directly from routes that hand back raw Mongo documents so they
+    skip FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
 
 
 def now_utc() -> datetime:
-    return datetime.now(timezone.utc)
+    return datetime.now(_UTC)
+
+
+# Default profile fields, validated once; new_profile() only fills in the per-user values
+_PROFILE_DEFAULTS = UserProfile(user_id="", coins=WELCOME_COINS).model_dump()
+
+
+def new_profile(user_id: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    now = now or now_utc()
+    return {**_PROFILE_DEFAULTS, "user_id": user_id, "created_at": now, "updated_at": now}
+
+
+def chat_doc(user_id: str, role: str, content: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Plain ChatMessage-shaped dict for server-built messages; skips pydantic validation.
+    # create_documents() adds the timestamps.
+    return {"user_id": user_id, "role": role, "content": content, "meta": meta}
+
+
+async def save_upload(file: UploadFile, path: str) -> int:
+    """Stream an upload to disk chunk by chunk and return the number of bytes written"""
+    size = 0
+    # aiofiles runs the blocking open/write calls in a worker thread
+    async with aiofiles.open(path, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await out.write(chunk)
+            size += len(chunk)
+    return size
 
 
-def ensure_user(user_id: str) -> Dict[str, Any]:
-    existing = db[COLLECTION_USER].find_one({"user_id": user_id}) if db else None
-    if existing:
-        return existing
-    profile = UserProfile(user_id=user_id, coins=WELCOME_COINS)
-    create_document(COLLECTION_USER, profile)
-    return db[COLLECTION_USER].find_one({"user_id": user_id})
+async def ensure_user(user_id: str) -> Dict[str, Any]:
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    # Single round-trip: insert the default profile only if the user is new
+    return await db[COLLECTION_USER].find_one_and_update(
+        {"user_id": user_id},
+        {"$setOnInsert": new_profile(user_id)},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def ensure_user_exists(user_id: str) -> None:
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    await db[COLLECTION_USER].update_one({"user_id": user_id}, {"$setOnInsert": new_profile(user_id)}, upsert=True)
 
 
 # ---------- Models ----------
@@ -112,42 +179,117 @@ PROBLEM_KB = {
 }
 
 
+# Intent keyword phrases, matched on words. The last word of a phrase also matches
+# any word starting with it ("pack" -> "packed", "repacking" does not), except the
+# STEM_EXCEPTIONS. Overlapping phrases resolve to the longest one (e.g. "safe to
+# eat"); across the text the intent listed first wins. "girls_safety" additionally
+# requires a word starting with one of SAFETY_STEMS.
+INTENT_KEYWORDS = [
+    ("where_travel", ["where should i travel", "go where", "destination"]),
+    ("budget_low", ["budget", "low money", "cheap"]),
+    ("eat_safe", ["eat", "food", "seafood", "fastfood", "restaurant", "safe to eat"]),
+    ("transport_best", ["transport", "bus", "train", "cab"]),
+    ("girls_safety", ["girl", "schoolgirl", "shopgirl", "woman", "women", "female"]),
+    ("packing", ["pack", "backpack", "unpack", "repack", "overpack", "luggage"]),
+    ("cost_reduce", ["reduce cost", "save money", "cost down"]),
+    ("confusing_plan", ["confusing", "fix plan", "improve itinerary"]),
+    ("hidden_places", ["hidden", "offbeat", "secret"]),
+    ("lost_item", ["lost", "missing", "misplaced"]),
+    ("scared", ["scared", "unsafe", "help me"]),
+    ("adventures", ["adventure", "activities"]),
+]
+SAFETY_STEMS = ("safe", "unsafe")
+# Shorter final words ("me" in "help me") only match exactly
+KEYWORD_STEM_MIN_LEN = 3
+# Words that start with a keyword but mean something else
+STEM_EXCEPTIONS = frozenset({
+    "busy", "business", "businesses", "bust", "bush",
+    "cabin", "cabins", "cabinet", "cabbage",
+    "package", "packages", "packet", "packets",
+    "training", "trainer", "trainers",
+    "secretary", "secretaries",
+})
+
+_INTENT_PRIORITY = {intent: priority for priority, (intent, _) in enumerate(INTENT_KEYWORDS)}
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _build_intent_trie() -> Dict[str, Any]:
+    # Nested dicts keyed by the leading words of each phrase. The None key maps the
+    # first KEYWORD_STEM_MIN_LEN letters of a phrase's last word to (last word, intent)
+    # pairs, so matching a word against phrase endings is a single dict lookup.
+    trie: Dict[str, Any] = {}
+    for intent, keywords in INTENT_KEYWORDS:
+        for keyword in keywords:
+            *leading, last = _tokenize(keyword)
+            node = trie
+            for token in leading:
+                node = node.setdefault(token, {})
+            node.setdefault(None, {}).setdefault(last[:KEYWORD_STEM_MIN_LEN], []).append((last, intent))
+    return trie
+
+
+_INTENT_TRIE = _build_intent_trie()
+
+
+def _phrase_end(node: Dict[str, Any], word: str) -> Optional[str]:
+    # Intent of the longest phrase ending at this node that `word` completes
+    best_len, best = 0, None
+    for last, intent in node.get(None, {}).get(word[:KEYWORD_STEM_MIN_LEN], ()):
+        if len(last) > best_len and (
+            word == last
+            or (len(last) >= KEYWORD_STEM_MIN_LEN and word.startswith(last) and word not in STEM_EXCEPTIONS)
+        ):
+            best_len, best = len(last), intent
+    return best
+
+
 def detect_intent(text: str) -> str:
-    t = text.lower()
-    if any(k in t for k in ["where should i travel", "go where", "destination"]):
-        return "where_travel"
-    if any(k in t for k in ["budget", "low money", "cheap"]):
-        return "budget_low"
-    if any(k in t for k in ["eat", "food", "restaurant", "safe to eat"]):
-        return "eat_safe"
-    if any(k in t for k in ["transport", "bus", "train", "cab"]):
-        return "transport_best"
-    if "safe" in t and any(k in t for k in ["girl", "women", "female"]):
-        return "girls_safety"
-    if any(k in t for k in ["pack", "packing", "luggage"]):
-        return "packing"
-    if any(k in t for k in ["reduce cost", "save money", "cost down"]):
-        return "cost_reduce"
-    if any(k in t for k in ["confusing", "fix plan", "improve itinerary"]):
-        return "confusing_plan"
-    if any(k in t for k in ["hidden", "offbeat", "secret"]):
-        return "hidden_places"
-    if any(k in t for k in ["lost", "missing", "misplaced"]):
-        return "lost_item"
-    if any(k in t for k in ["scared", "unsafe", "help me"]):
-        return "scared"
-    if any(k in t for k in ["adventure", "activities"]):
-        return "adventures"
-    return "general"
+    tokens = _tokenize(text)
+    hits = set()
+    start = 0
+    while start < len(tokens):
+        # Leftmost-longest: take the longest phrase starting here, then skip past it
+        node, match, match_end = _INTENT_TRIE, None, start
+        for end in range(start, len(tokens)):
+            intent = _phrase_end(node, tokens[end])
+            if intent:
+                match, match_end = intent, end
+            node = node.get(tokens[end])
+            if node is None:
+                break
+        if match:
+            hits.add(match)
+        start = match_end + 1
+    if not any(token.startswith(SAFETY_STEMS) for token in tokens):
+        hits.discard("girls_safety")
+    return min(hits, key=_INTENT_PRIORITY.__getitem__) if hits else "general"
+
+
+REPLY_CACHE_MAX_LEN = 256
+REPLY_FOLLOWUPS = (
+    "What’s your budget range?",
+    "When are you traveling?",
+    "Solo or with friends/family?",
+)
+REPLY_TIPS_EN = (
+    "Keep digital + paper copies of IDs.",
+    "Share your live location when traveling late.",
+    "Avoid exchanging cash at airports; use ATMs or cards.",
+)
+REPLY_TIPS_HI = (
+    "ID ki digital aur paper copies rakhein.",
+    "Late travel pe live location share karein.",
+    "Airport par currency exchange mehenga ho sakta hai.",
+)
 
 
-def ai_reply(message: str, locale: str = "en") -> ChatResponse:
+def _reply_text(message: str, locale: str) -> str:
     intent = detect_intent(message)
-    followups = [
-        "What’s your budget range?",
-        "When are you traveling?",
-        "Solo or with friends/family?",
-    ]
 
     if intent == "where_travel":
         txt = (
@@ -160,36 +302,56 @@ def ai_reply(message: str, locale: str = "en") -> ChatResponse:
             "I’ve got you. Share your city, dates and budget. I’ll suggest options, safety notes and a simple plan."
         )
 
-    tips = [
-        "Keep digital + paper copies of IDs.",
-        "Share your live location when traveling late.",
-        "Avoid exchanging cash at airports; use ATMs or cards.",
-    ]
-
     # Basic bilingual support
-    if locale.startswith("hi"):
-        txt = (
-            "Bilkul! Apna budget, tareekh aur vibe batayein. Main aapko behtareen options, safety tips aur simple plan dunga/dungi."
-            if intent == "general"
-            else txt
-        )
-        tips = [
-            "ID ki digital aur paper copies rakhein.",
-            "Late travel pe live location share karein.",
-            "Airport par currency exchange mehenga ho sakta hai.",
-        ]
+    if locale.startswith("hi") and intent == "general":
+        txt = "Bilkul! Apna budget, tareekh aur vibe batayein. Main aapko behtareen options, safety tips aur simple plan dunga/dungi."
+
+    return txt
+
 
-    return ChatResponse(reply=txt, followups=followups, tips=tips, locale=locale)
+_cached_reply_text = lru_cache(maxsize=4096)(_reply_text)
+
+
+def ai_reply(message: str, locale: str = "en") -> ChatResponse:
+    # Normalize once so repeated phrasings share a cache entry
+    message = message.strip().lower()
+    # Only short keys are cached so large client messages can't pin memory
+    short = len(message) <= REPLY_CACHE_MAX_LEN and len(locale) <= REPLY_CACHE_MAX_LEN
+    reply = (_cached_reply_text if short else _reply_text)(message, locale)
+    tips = REPLY_TIPS_HI if locale.startswith("hi") else REPLY_TIPS_EN
+    return ChatResponse(reply=reply, followups=REPLY_FOLLOWUPS, tips=tips, locale=locale)
 
 
 # ---------- Routes ----------
+@app.on_event("startup")
+async def create_indexes():
+    if db is None:
+        return
+    # A database outage must not stop the DB-free endpoints from booting
+    try:
+        await db[COLLECTION_USER].create_index([("user_id", 1)], unique=True)
+        # _id breaks ties between messages of one turn, which share a created_at
+        await db[COLLECTION_CHAT].create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        for collection in (COLLECTION_PASS, COLLECTION_REWARD, COLLECTION_VAULT):
+            await db[collection].create_index([("user_id", 1), ("created_at", -1)])
+    except Exception as e:
+        logger.warning("Index creation skipped: %s", str(e)[:200])
+
+
+@app.on_event("startup")
+def create_upload_dirs():
+    # Once per worker; the upload handlers assume these folders exist
+    for folder in (VAULT_DIR, VOICE_DIR):
+        os.makedirs(folder, exist_ok=True)
+
+
 @app.get("/")
 def root():
     return {"message": "AI Travel Assistant Backend running"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -202,7 +364,7 @@ def test_database():
         if db is not None:
             response["database"] = "✅ Available"
             response["connection_status"] = "Connected"
-            response["collections"] = db.list_collection_names()[:10]
+            response["collections"] = (await db.list_collection_names())[:10]
             response["database"] = "✅ Connected & Working"
     except Exception as e:
         response["database"] = f"⚠️ Connected but error: {str(e)[:80]}"
@@ -210,89 +372,114 @@ def test_database():
 
 
 @app.post("/api/init")
-def init_user(req: InitRequest):
-    profile = ensure_user(req.user_id)
+async def init_user(req: InitRequest):
+    profile = await ensure_user(req.user_id)
     return {"ok": True, "user": {"user_id": profile["user_id"], "coins": profile.get("coins", 0)}}
 
 
 @app.get("/api/profile/{user_id}")
-def get_profile(user_id: str):
-    profile = ensure_user(user_id)
+async def get_profile(user_id: str):
+    profile = await ensure_user(user_id)
     return {"ok": True, "user": {"user_id": profile["user_id"], "coins": profile.get("coins", 0), "language": profile.get("language", "auto")}}
 
 
 @app.get("/api/history/{user_id}")
-def get_history(user_id: str):
-    messages = get_documents(COLLECTION_CHAT, {"user_id": user_id}, limit=100)
-    # sanitize ObjectId
-    for m in messages:
-        m["_id"] = str(m["_id"])
-    return {"ok": True, "messages": messages}
+async def get_history(user_id: str):
+    # Newest 100 straight off the (user_id, created_at, _id) index, returned oldest-first
+    messages = await get_documents(
+        COLLECTION_CHAT,
+        {"user_id": user_id},
+        limit=100,
+        projection=HISTORY_FIELDS,
+        sort=[("created_at", -1), ("_id", -1)],
+    )
+    messages.reverse()
+    return MongoJSONResponse({"ok": True, "messages": messages})
 
 
 @app.post("/api/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    ensure_user(req.user_id)
-    create_document(COLLECTION_CHAT, ChatMessage(user_id=req.user_id, role="user", content=req.message))
+async def chat(req: ChatRequest):
+    await ensure_user_exists(req.user_id)
     response = ai_reply(req.message, req.locale)
-    create_document(COLLECTION_CHAT, ChatMessage(user_id=req.user_id, role="assistant", content=response.reply, meta={"tips": response.tips}))
+    await create_documents(COLLECTION_CHAT, [
+        chat_doc(req.user_id, "user", req.message),
+        chat_doc(req.user_id, "assistant", response.reply, {"tips": response.tips}),
+    ])
     return response
 
 
+# Base food rates per day per person, by daily style
+BUDGET_BASE = {"thrifty": 18, "standard": 35, "comfort": 60}
+BUDGET_ACCOM = {"budget": 15, "mid": 35, "premium": 80}
+BUDGET_DEST_ADJ = {"city": 1.0, "beach": 1.1, "mountains": 0.9, "rural": 0.8}
+BUDGET_DAILY_MISC = 5
+BUDGET_SUGGESTIONS = (
+    "Book stays with kitchens to save on breakfasts.",
+    "Use day passes for public transport.",
+    "Travel mid-week to reduce fares.",
+)
+
+
+def _daily_rates(base: int, adj: float) -> Tuple[float, float, float]:
+    daily_food = base * adj
+    daily_transport = 8 * adj
+    return daily_food, daily_transport, daily_food + daily_transport + BUDGET_DAILY_MISC
+
+
+# (food, transport, per-person total) per day, precomputed for every style/destination pair
+_DAILY_RATES = {
+    style: {dest: _daily_rates(base, adj) for dest, adj in BUDGET_DEST_ADJ.items()}
+    for style, base in BUDGET_BASE.items()
+}
+_DEFAULT_DAILY_RATES = {style: _daily_rates(base, 1.0) for style, base in BUDGET_BASE.items()}
+
+
 @app.post("/api/budget", response_model=BudgetOutput)
 def budget_calc(inp: BudgetInput):
-    # Base rates per day per person
-    base = {
-        "thrifty": 18,
-        "standard": 35,
-        "comfort": 60,
-    }[inp.daily_style]
-    accom_map = {"budget": 15, "mid": 35, "premium": 80}
-    dest_adj = {"city": 1.0, "beach": 1.1, "mountains": 0.9, "rural": 0.8}
-
-    daily_food = base * dest_adj.get(inp.destination_type, 1.0)
-    daily_transport = 8 * dest_adj.get(inp.destination_type, 1.0)
-    daily_misc = 5
-    per_person_daily = daily_food + daily_transport + daily_misc
-
-    accom_daily = accom_map.get(inp.accommodation, 15)
+    rates = _DAILY_RATES[inp.daily_style].get(inp.destination_type) or _DEFAULT_DAILY_RATES[inp.daily_style]
+    daily_food, daily_transport, per_person_daily = rates
+    accom_daily = BUDGET_ACCOM.get(inp.accommodation, 15)
     total = (per_person_daily * inp.travelers + accom_daily) * inp.days
 
     breakdown = {
         "food": round(daily_food * inp.travelers * inp.days, 2),
         "transport": round(daily_transport * inp.travelers * inp.days, 2),
-        "misc": round(daily_misc * inp.travelers * inp.days, 2),
+        "misc": round(BUDGET_DAILY_MISC * inp.travelers * inp.days, 2),
         "stay": round(accom_daily * inp.days, 2),
     }
 
-    suggestions = [
-        "Book stays with kitchens to save on breakfasts.",
-        "Use day passes for public transport.",
-        "Travel mid-week to reduce fares.",
-    ]
-
     return BudgetOutput(
         total_estimate=round(total, 2),
         per_day=round(total / max(inp.days, 1), 2),
         breakdown=breakdown,
-        suggestions=suggestions,
+        suggestions=BUDGET_SUGGESTIONS,
     )
 
 
+TIPS_EN = [
+    {"title": "Scan documents", "body": "Keep passport/IDs in cloud + local copy."},
+    {"title": "Local SIM", "body": "Buy at airport/train hubs for instant connectivity."},
+    {"title": "Hydration", "body": "Carry a refillable bottle and purification tabs."},
+]
+TIPS_HI = [
+    {"title": "Docs ka backup", "body": "Passport/ID ki copies cloud me rakhein."},
+    {"title": "Local SIM", "body": "Airport ya station par lena aasaan hota hai."},
+    {"title": "Paani", "body": "Refillable bottle saath rakhein."},
+]
+# Tips are static per locale, so the response bodies are encoded once at import
+_TIPS_EN_BODY = orjson.dumps({"ok": True, "tips": TIPS_EN})
+_TIPS_HI_BODY = orjson.dumps({"ok": True, "tips": TIPS_HI})
+
+
 @app.get("/api/tips")
 def tips(locale: str = "en"):
-    items = [
-        {"title": "Scan documents", "body": "Keep passport/IDs in cloud + local copy."},
-        {"title": "Local SIM", "body": "Buy at airport/train hubs for instant connectivity."},
-        {"title": "Hydration", "body": "Carry a refillable bottle and purification tabs."},
-    ]
-    if locale.startswith("hi"):
-        items = [
-            {"title": "Docs ka backup", "body": "Passport/ID ki copies cloud me rakhein."},
-            {"title": "Local SIM", "body": "Airport ya station par lena aasaan hota hai."},
-            {"title": "Paani", "body": "Refillable bottle saath rakhein."},
-        ]
-    return {"ok": True, "tips": items}
+    body = _TIPS_HI_BODY if locale.startswith("hi") else _TIPS_EN_BODY
+    return Response(content=body, media_type="application/json")
+
+
+# Word-level hi->en substitutions, applied in a single regex pass
+HI_EN_WORDS = {"hai": "is", "nahi": "not", "kya": "what"}
+_HI_EN_RE = re.compile(r"\b(" + "|".join(map(re.escape, HI_EN_WORDS)) + r")\b")
 
 
 @app.post("/api/translate")
@@ -301,65 +488,75 @@ def translate(req: TranslateRequest):
     text = req.text.strip()
     if req.target.startswith("hi"):
         return {"ok": True, "text": f"[HI] {text}"}
-    return {"ok": True, "text": text.replace(" hai ", " is ")}
+    return {"ok": True, "text": _HI_EN_RE.sub(lambda m: HI_EN_WORDS[m.group()], text)}
 
 
 @app.get("/api/coins/{user_id}")
-def coins(user_id: str):
-    profile = ensure_user(user_id)
+async def coins(user_id: str):
+    profile = await ensure_user(user_id)
     return {"ok": True, "coins": profile.get("coins", 0)}
 
 
 @app.post("/api/reward")
-def reward(req: RewardRequest):
-    profile = ensure_user(req.user_id)
-    new_balance = profile.get("coins", 0) + max(0, req.coins)
-    db[COLLECTION_USER].update_one({"user_id": req.user_id}, {"$set": {"coins": new_balance, "updated_at": now_utc()}})
-    create_document(COLLECTION_REWARD, RewardLedger(**req.model_dump()))
-    return {"ok": True, "coins": new_balance}
+async def reward(req: RewardRequest):
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    # Upsert + credit in one pipeline update; new users still get the welcome coins
+    now = now_utc()
+    defaults = {k: {"$ifNull": [f"${k}", {"$literal": v}]} for k, v in new_profile(req.user_id, now).items()}
+    profile = await db[COLLECTION_USER].find_one_and_update(
+        {"user_id": req.user_id},
+        [{"$set": {
+            **defaults,
+            "coins": {"$add": [{"$ifNull": ["$coins", WELCOME_COINS]}, max(0, req.coins)]},
+            "updated_at": now,
+        }}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    await create_document(COLLECTION_REWARD, RewardLedger(**req.model_dump()))
+    return {"ok": True, "coins": profile["coins"]}
 
 
 @app.post("/api/redeem")
-def redeem(req: RedeemRequest):
+async def redeem(req: RedeemRequest):
     costs = {"1d": 10, "7d": 50, "30d": 150}
     days = {"1d": 1, "7d": 7, "30d": 30}[req.duration]
-    profile = ensure_user(req.user_id)
-    bal = profile.get("coins", 0)
     price = costs[req.duration]
-    if bal < price:
+    now = now_utc()
+    await ensure_user_exists(req.user_id)
+    # Conditional debit: only matches while the balance covers the price, so concurrent redeems can't overspend
+    res = await db[COLLECTION_USER].update_one(
+        {"user_id": req.user_id, "coins": {"$gte": price}},
+        {"$inc": {"coins": -price}, "$set": {"updated_at": now}},
+    )
+    if res.modified_count == 0:
         return {"ok": False, "error": "Not enough coins"}
-    db[COLLECTION_USER].update_one({"user_id": req.user_id}, {"$set": {"coins": bal - price, "updated_at": now_utc()}})
-    pass_doc = PremiumPass(user_id=req.user_id, feature=req.feature, expires_at=now_utc() + timedelta(days=days))
-    create_document(COLLECTION_PASS, pass_doc)
+    pass_doc = PremiumPass(user_id=req.user_id, feature=req.feature, expires_at=now + timedelta(days=days))
+    await create_document(COLLECTION_PASS, pass_doc)
     return {"ok": True, "feature": req.feature, "expires_at": pass_doc.expires_at}
 
 
 @app.get("/api/passes/{user_id}")
-def passes(user_id: str):
-    docs = get_documents(COLLECTION_PASS, {"user_id": user_id})
-    for d in docs:
-        d["_id"] = str(d["_id"])
-    return {"ok": True, "passes": docs}
+async def passes(user_id: str):
+    docs = await get_documents(COLLECTION_PASS, {"user_id": user_id}, projection=PASS_FIELDS)
+    return MongoJSONResponse({"ok": True, "passes": docs})
 
 
 @app.post("/api/image")
 async def upload_image(user_id: str = Form(...), file: UploadFile = File(...)):
-    ensure_user(user_id)
+    await ensure_user_exists(user_id)
     # store file to tmp path
-    folder = "/tmp/travel_vault"
-    os.makedirs(folder, exist_ok=True)
-    path = os.path.join(folder, f"{now_utc().timestamp()}_{file.filename}")
-    content = await file.read()
-    with open(path, "wb") as f:
-        f.write(content)
+    path = os.path.join(VAULT_DIR, f"{time.time_ns()}_{file.filename}")
+    size = await save_upload(file, path)
     # save record
-    create_document(
+    await create_document(
         COLLECTION_VAULT,
         VaultDocument(
             user_id=user_id,
             filename=file.filename,
             filetype=file.content_type or "unknown",
-            size=len(content),
+            size=size,
             storage_path=path,
         ),
     )
@@ -370,19 +567,17 @@ async def upload_image(user_id: str = Form(...), file: UploadFile = File(...)):
 
 @app.post("/api/voice")
 async def upload_voice(user_id: str = Form(...), file: UploadFile = File(...)):
-    ensure_user(user_id)
+    await ensure_user_exists(user_id)
     # Demo-only: store file and return mocked transcript
-    folder = "/tmp/travel_voice"
-    os.makedirs(folder, exist_ok=True)
-    path = os.path.join(folder, f"{now_utc().timestamp()}_{file.filename}")
-    content = await file.read()
-    with open(path, "wb") as f:
-        f.write(content)
+    path = os.path.join(VOICE_DIR, f"{time.time_ns()}_{file.filename}")
+    await save_upload(file, path)
     transcript = "Voice received. For now I converted it to: 'Help me plan cheap local transport.'"
-    # Also log to history
-    create_document(COLLECTION_CHAT, ChatMessage(user_id=user_id, role="user", content=transcript, meta={"source": "voice"}))
     response = ai_reply(transcript)
-    create_document(COLLECTION_CHAT, ChatMessage(user_id=user_id, role="assistant", content=response.reply))
+    # Also log to history
+    await create_documents(COLLECTION_CHAT, [
+        chat_doc(user_id, "user", transcript, {"source": "voice"}),
+        chat_doc(user_id, "assistant", response.reply),
+    ])
     return {"ok": True, "transcript": transcript, "reply": response.reply}
 
 